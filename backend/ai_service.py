@@ -1,23 +1,42 @@
-from google import genai
 import os
 import json
 import re
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Optional
+
+import startup
 
 class AIService:
     def __init__(self):
+        # google.genai is slow to import, so the client is built on first use
+        self._client = None
+        self._client_loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Optional[Any]:
+        if not self._client_loaded:
+            with self._lock:
+                if not self._client_loaded:
+                    self._client = self._create_client()
+                    self._client_loaded = True
+        return self._client
+
+    def _create_client(self):
         api_key = os.environ.get("GEMINI_API_KEY")
         if not api_key:
             print("Warning: GEMINI_API_KEY not found in environment variables.")
-        else:
-            self.client = genai.Client(api_key=api_key)
+            return None
+        with startup.timed("import_genai"):
+            from google import genai
+        return genai.Client(api_key=api_key)
 
     def generate_exercise(self, prompt: str, language: str = "python") -> Dict[str, Any]:
         """
         Generates a coding exercise based on a prompt.
         Returns a dictionary with title, lesson, assignment, starting_code, and test_cases.
         """
-        if not hasattr(self, "client"):
+        if self.client is None:
              return {"error": "AI service not configured"}
 
         full_prompt = f"""
@@ -86,7 +105,7 @@ class AIService:
         """
         Chat with the AI about implementation details.
         """
-        if not hasattr(self, "client"):
+        if self.client is None:
              return "AI service not configured."
 
         system_prompt = """
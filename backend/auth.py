@@ -2,7 +2,6 @@ from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Security
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
 import bcrypt  # Changed: Use bcrypt directly
 from sqlmodel import Session, select
 from models import User, UserCreate, UserRead, Token, TokenData
@@ -21,6 +20,21 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
 
 # --- Helper Functions ---
+def _jwt():
+    # python-jose pulls in its crypto backends on import; defer that to first use
+    from jose import jwt
+    return jwt
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """
+    Returns the token payload, or None if the token is invalid or expired.
+    """
+    from jose import JWTError
+    try:
+        return _jwt().decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
 def verify_password(plain_password, hashed_password):
     # Changed: Use bcrypt checkpw
     # Ensure bytes
@@ -40,7 +54,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=15)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = _jwt().encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 # --- Dependencies ---
@@ -50,15 +64,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: Session
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        role: str = payload.get("role")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username, role=role)
-    except JWTError:
+    payload = decode_access_token(token)
+    if payload is None:
+        raise credentials_exception
+    username: str = payload.get("sub")
+    role: str = payload.get("role")
+    if username is None:
         raise credentials_exception
+    token_data = TokenData(username=username, role=role)
     
     user = session.exec(select(User).where(User.username == token_data.username)).first()
     if user is None:
@@ -75,14 +88,13 @@ async def get_optional_user(token: str = Depends(oauth2_scheme_optional), sessio
     if not token:
         return None
         
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        token_data = TokenData(username=username, role=payload.get("role"))
-    except JWTError:
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    username: str = payload.get("sub")
+    if username is None:
         return None
+    token_data = TokenData(username=username, role=payload.get("role"))
     
     user = session.exec(select(User).where(User.username == token_data.username)).first()
     return user
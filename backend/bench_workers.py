@@ -0,0 +1,164 @@
+"""
+Measures throughput of the multi-worker profile as workers are added.
+
+    python bench_workers.py [--workers 1 2 4 8] [--target search ai]
+                            [--clients 32] [--duration 10] [--seed 5000]
+
+For each target and worker count it starts `serve.py` on a scratch
+database seeded with synthetic exercises, drives it with keep-alive HTTP
+clients from separate processes and reports requests/second and scaling
+efficiency relative to the per-worker throughput of the first run.
+A single-process run with in-memory state comes first, so the cost of
+the shared state is visible too.
+
+Targets:
+    root    GET / - framework overhead only, the control for the others
+    search  GET /search?q=rust - database reads, no rate limit
+    ai      POST /ai/discuss as an anonymous caller - every request takes
+            from the shared SQLite token bucket; with the budget spent
+            most answers are 429, which still count as served
+
+Use a machine with at least as many cores as the largest worker count
+plus some headroom for the load generators.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (method, path, body)
+TARGETS = {
+    "root": ("GET", "/", None),
+    "search": ("GET", "/search?q=rust", None),
+    # Without GEMINI_API_KEY the handler answers without calling out
+    "ai": ("POST", "/ai/discuss", json.dumps({"message": "Why does this borrow fail?"})),
+}
+# A rate-limited answer is a fully served request for our purposes
+SERVED = (200, 429)
+
+
+def _client(port: int, target: str, duration: float, counter):
+    method, path, body = TARGETS[target]
+    headers = {"Content-Type": "application/json"} if body else {}
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    done = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        if response.status in SERVED:
+            done += 1
+    with counter.get_lock():
+        counter.value += done
+
+
+def _wait_until_up(port: int, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def bench(workers: int, port: int, target: str, clients: int, duration: float, database_url: str) -> float:
+    """workers=0 runs plain uvicorn in single mode (in-memory state)."""
+    env = {**os.environ, "DATABASE_URL": database_url, "STATE_DIR": tempfile.mkdtemp()}
+    env.pop("GEMINI_API_KEY", None)
+    if workers:
+        cmd = [sys.executable, "serve.py", "--workers", str(workers)]
+    else:
+        env.pop("DEPLOYMENT_MODE", None)
+        cmd = [sys.executable, "-m", "uvicorn", "main:app"]
+    server = subprocess.Popen(
+        cmd + ["--host", "127.0.0.1", "--port", str(port)],
+        cwd=HERE,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_until_up(port)
+        # Warm every worker (lazy imports, connection pools) before measuring
+        _run_clients(port, target, clients, 1.0)
+        return _run_clients(port, target, clients, duration) / duration
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _run_clients(port: int, target: str, clients: int, duration: float) -> int:
+    counter = multiprocessing.Value("l", 0)
+    procs = [
+        multiprocessing.Process(target=_client, args=(port, target, duration, counter))
+        for _ in range(clients)
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    return counter.value
+
+
+def _seed(database_url: str, exercises: int):
+    """Loads a synthetic course through the bulk importer, in a subprocess
+    so this process never binds the app's engine."""
+    lines = [json.dumps({"type": "course", "slug": "bench", "title": "Rust benchmarks", "description": "Synthetic"})]
+    topics = ["ownership", "borrowing", "lifetimes", "traits", "iterators", "closures", "enums", "macros"]
+    for i in range(exercises):
+        topic = topics[i % len(topics)]
+        lines.append(json.dumps({
+            "type": "exercise", "course_slug": "bench", "slug": f"ex-{i}", "order": i,
+            "title": f"Rust {topic} #{i}", "description": f"Practice {topic} in rust. " * 20,
+        }))
+    subprocess.run(
+        [sys.executable, "bulk.py", "import", "-"],
+        input="\n".join(lines), text=True, check=True, cwd=HERE,
+        env={**os.environ, "DATABASE_URL": database_url}, stdout=subprocess.DEVNULL,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--target", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=5000, help="Synthetic exercises to load")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    db_path = os.path.join(scratch, "bench.db")
+    _seed(f"sqlite:///{db_path}", args.seed)
+
+    print(f"{'target':>8} {'workers':>8} {'req/s':>10} {'speedup':>8} {'efficiency':>10}")
+    for target in args.target:
+        single = bench(0, args.port, target, args.clients, args.duration, f"sqlite:///{db_path}")
+        print(f"{target:>8} {'single':>8} {single:>10.1f}")
+        baseline = None
+        for workers in args.workers:
+            rps = bench(workers, args.port, target, args.clients, args.duration, f"sqlite:///{db_path}")
+            baseline = baseline or rps / workers
+            speedup = rps / baseline
+            print(f"{target:>8} {workers:>8} {rps:>10.1f} {speedup:>8.2f} {speedup / workers:>10.0%}")
+
+    shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Bulk import/export of courses as NDJSON (one JSON record per line).
+
+Archive layout: each course record is followed by its exercises.
+
+    {"type": "course", "slug": "rust-basics", "title": ..., ...}
+    {"type": "exercise", "course_slug": "rust-basics", "slug": "ownership", ...}
+
+Import upserts courses by slug and exercises by (course, slug).
+
+CLI:
+    python bulk.py export [--course SLUG ...] [-o courses.ndjson]
+    python bulk.py import courses.ndjson [--chunk-size 500]
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from pydantic import ValidationError
+from sqlmodel import Session, select
+
+from database import engine
+from models import Course, CourseBase, CourseCreate, Exercise, ExerciseBase, ExerciseCreate
+import search
+
+COURSE_FIELDS = [name for name in CourseBase.model_fields]
+EXERCISE_FIELDS = [name for name in ExerciseBase.model_fields if name != "course_id"]
+
+# Rows fetched per round-trip while streaming the export
+EXPORT_BATCH_SIZE = 500
+
+# Longest archive line accepted; bounds what an import buffers per record
+MAX_RECORD_BYTES = 1024 * 1024
+
+
+class ArchiveError(ValueError):
+    """Raised for malformed archive records; carries the line number."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+# --- Export ---
+
+def export_ndjson(course_slugs: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    Yields the archive line by line. Rows are streamed from the database
+    with yield_per, so memory stays flat regardless of course size.
+    Uses its own session so it can outlive the request handler.
+    """
+    with Session(engine) as session:
+        courses = select(Course).order_by(Course.id)
+        if course_slugs:
+            courses = courses.where(Course.slug.in_(course_slugs))
+        course_rows = session.exec(courses).all()
+
+        for course in course_rows:
+            yield _dumps({"type": "course", **{f: getattr(course, f) for f in COURSE_FIELDS}})
+            exercises = (
+                select(Exercise)
+                .where(Exercise.course_id == course.id)
+                .order_by(Exercise.order, Exercise.id)
+                .execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            for exercise in session.exec(exercises):
+                yield _dumps({
+                    "type": "exercise",
+                    "course_slug": course.slug,
+                    **{f: getattr(exercise, f) for f in EXERCISE_FIELDS},
+                })
+            # Exercises for this course are done; drop them from the identity map
+            session.expunge_all()
+
+
+def _dumps(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+# --- Import ---
+
+def _empty_stats() -> Dict[str, int]:
+    return {"courses_created": 0, "courses_updated": 0, "exercises_created": 0, "exercises_updated": 0}
+
+
+class Importer:
+    """
+    Accumulates records and writes them in chunks, one transaction per chunk.
+    A failing chunk is rolled back; earlier chunks stay committed and
+    progress() tells the caller how far the import got.
+    """
+
+    def __init__(self, session: Session, chunk_size: int = 500):
+        self.session = session
+        self.chunk_size = chunk_size
+        self.buffer: List[tuple] = []
+        self.course_ids: Dict[str, int] = {}
+        # Committed counts only; the chunk being written counts into _pending
+        self.stats = _empty_stats()
+        self._pending = _empty_stats()
+        self.committed_chunks = 0
+        self.committed_through_line = 0
+        self.line = 0
+
+    def add_line(self, raw: str):
+        self.line += 1
+        if len(raw) > MAX_RECORD_BYTES:
+            raise ArchiveError(self.line, f"record longer than {MAX_RECORD_BYTES} bytes")
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            record = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ArchiveError(self.line, f"invalid JSON ({e.msg})")
+        if not isinstance(record, dict) or record.get("type") not in ("course", "exercise"):
+            raise ArchiveError(self.line, "record must be an object with type 'course' or 'exercise'")
+        self.buffer.append((self.line, record))
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def add_lines(self, lines: Iterable[str]):
+        for raw in lines:
+            self.add_line(raw)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        chunk, self.buffer = self.buffer, []
+        self._pending = _empty_stats()
+        try:
+            self._write_chunk(chunk)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            # Ids cached from the rolled-back chunk may no longer exist
+            self.course_ids.clear()
+            raise
+        self.session.expunge_all()
+        for key, count in self._pending.items():
+            self.stats[key] += count
+        self.committed_chunks += 1
+        self.committed_through_line = chunk[-1][0]
+
+    def finish(self) -> Dict[str, int]:
+        self.flush()
+        return self.stats
+
+    def progress(self) -> Dict[str, Any]:
+        """What is committed so far; reported when a later chunk fails."""
+        return {
+            "committed_chunks": self.committed_chunks,
+            "committed_through_line": self.committed_through_line,
+            **self.stats,
+        }
+
+    def _write_chunk(self, chunk: List[tuple]):
+        # Consecutive exercises of the same course are upserted together,
+        # so existing rows are looked up with one query per group.
+        pending: List[tuple] = []
+        for line, record in chunk:
+            if record["type"] == "course":
+                self._write_exercises(pending)
+                pending = []
+                self._upsert_course(line, record)
+            else:
+                if pending and pending[-1][1].get("course_slug") != record.get("course_slug"):
+                    self._write_exercises(pending)
+                    pending = []
+                pending.append((line, record))
+        self._write_exercises(pending)
+
+    def _upsert_course(self, line: int, record: Dict[str, Any]):
+        data = self._validate(line, record, CourseCreate, COURSE_FIELDS)
+        course = self.session.exec(select(Course).where(Course.slug == data["slug"])).first()
+        if course:
+            for key, value in data.items():
+                setattr(course, key, value)
+            self._pending["courses_updated"] += 1
+        else:
+            course = Course(**data)
+            self._pending["courses_created"] += 1
+        self.session.add(course)
+        self.session.flush()
+        search.index_course(self.session, course)
+        self.course_ids[course.slug] = course.id
+
+    def _course_id(self, line: int, slug: Optional[str]) -> int:
+        if not slug:
+            raise ArchiveError(line, "exercise is missing course_slug")
+        if slug not in self.course_ids:
+            course_id = self.session.exec(select(Course.id).where(Course.slug == slug)).first()
+            if course_id is None:
+                raise ArchiveError(line, f"unknown course '{slug}'")
+            self.course_ids[slug] = course_id
+        return self.course_ids[slug]
+
+    def _write_exercises(self, pending: List[tuple]):
+        if not pending:
+            return
+        first_line, first = pending[0]
+        course_id = self._course_id(first_line, first.get("course_slug"))
+
+        rows = [
+            (line, self._validate(line, record, ExerciseCreate, EXERCISE_FIELDS))
+            for line, record in pending
+        ]
+        slugs = [data["slug"] for _, data in rows]
+        existing = {
+            exercise.slug: exercise
+            for exercise in self.session.exec(
+                select(Exercise).where(Exercise.course_id == course_id, Exercise.slug.in_(slugs))
+            )
+        }
+
+        touched = []
+        for _, data in rows:
+            exercise = existing.get(data["slug"])
+            if exercise:
+                for key, value in data.items():
+                    setattr(exercise, key, value)
+                self._pending["exercises_updated"] += 1
+            else:
+                data.setdefault("initial_code", "")
+                data.setdefault("test_code", "")
+                exercise = Exercise(**data, course_id=course_id)
+                existing[data["slug"]] = exercise
+                self._pending["exercises_created"] += 1
+            self.session.add(exercise)
+            touched.append(exercise)
+
+        self.session.flush()
+        for exercise in touched:
+            search.index_exercise(self.session, exercise)
+
+    @staticmethod
+    def _validate(line: int, record: Dict[str, Any], model, fields: List[str]) -> Dict[str, Any]:
+        """
+        Checks the record against the API's create model and returns the
+        coerced values of the fields it contains (updates leave the rest alone).
+        """
+        missing = [f for f in ("slug", "title", "description") if not record.get(f)]
+        if missing:
+            raise ArchiveError(line, f"missing field(s): {', '.join(missing)}")
+        data = {f: record[f] for f in fields if f in record}
+        # Code fields may be omitted from an archive; new rows get them empty
+        defaults = {"initial_code": "", "test_code": ""} if model is ExerciseCreate else {}
+        try:
+            validated = model.model_validate({**defaults, **data})
+        except ValidationError as e:
+            problems = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            raise ArchiveError(line, f"invalid {record['type']} ({problems})")
+        return {f: getattr(validated, f) for f in data}
+
+
+# --- CLI ---
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk import/export of courses (NDJSON)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="Write courses and exercises as NDJSON")
+    export_cmd.add_argument("--course", action="append", dest="courses", help="Course slug (repeatable)")
+    export_cmd.add_argument("-o", "--output", help="Output file (default: stdout)")
+
+    import_cmd = sub.add_parser("import", help="Upsert courses and exercises from NDJSON")
+    import_cmd.add_argument("input", help="Input file, or - for stdin")
+    import_cmd.add_argument("--chunk-size", type=int, default=500)
+
+    args = parser.parse_args(argv)
+    engine.echo = False
+
+    if args.command == "export":
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            for line in export_ndjson(args.courses):
+                out.write(line)
+        finally:
+            if args.output:
+                out.close()
+        return
+
+    from database import create_db_and_tables
+    create_db_and_tables()
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        with Session(engine) as session:
+            importer = Importer(session, chunk_size=args.chunk_size)
+            try:
+                importer.add_lines(src)
+                stats = importer.finish()
+            except ArchiveError as e:
+                print(f"Import failed at {e}", file=sys.stderr)
+                print(json.dumps(importer.progress()), file=sys.stderr)
+                sys.exit(1)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
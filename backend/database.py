@@ -1,14 +1,60 @@
 import os
+import zlib
+from sqlalchemy import event
 from sqlmodel import SQLModel, create_engine, Session
+import shared_state
 
 sqlite_file_name = "database.db"
 sqlite_url = os.environ.get("DATABASE_URL", f"sqlite:///{sqlite_file_name}")
 
+# Statement logging is costly on every query; opt in with SQL_ECHO=1
+sql_echo = os.environ.get("SQL_ECHO", "").lower() in ("1", "true", "yes")
+
 connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, echo=True, connect_args=connect_args)
+engine = create_engine(sqlite_url, echo=sql_echo, connect_args=connect_args)
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Writers wait for the lock instead of failing immediately
+        cursor.execute("PRAGMA busy_timeout=5000")
+        if shared_state.is_multi_worker():
+            # Readers proceed while another worker writes. Needs a local
+            # filesystem, so it's only enabled by the multi-worker profile.
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+def schema_fingerprint() -> int:
+    """
+    Hash of the tables/columns the app expects. Stored in SQLite's
+    user_version so startup can skip the schema check when nothing changed.
+    """
+    tables = sorted(SQLModel.metadata.tables.values(), key=lambda t: t.name)
+    description = ";".join(f"{t.name}({','.join(c.name for c in t.columns)})" for t in tables)
+    from search import CREATE_INDEX_SQL
+    description += f";{CREATE_INDEX_SQL}"
+    # user_version is a signed 32-bit integer
+    return zlib.crc32(description.encode()) & 0x7FFFFFFF
+
+def create_db_and_tables(force: bool = False):
+    # Imported here to avoid a cycle; it also registers the model tables
+    from search import create_search_index
+    is_sqlite = engine.dialect.name == "sqlite"
+    fingerprint = schema_fingerprint()
+
+    if is_sqlite and not force:
+        with engine.connect() as conn:
+            if conn.exec_driver_sql("PRAGMA user_version").scalar() == fingerprint:
+                return
 
-def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    create_search_index(engine)
+
+    if is_sqlite:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {fingerprint}")
 
 def get_session():
     with Session(engine) as session:
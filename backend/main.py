@@ -1,26 +1,38 @@
+import startup  # first, so its clock covers the imports below
 from contextlib import asynccontextmanager
-from typing import List
+from typing import Dict, List
 from sqlmodel import Session, select
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import subprocess
-import tempfile
 import os
 
 from database import create_db_and_tables, get_session
 from models import Course, CourseCreate, CourseRead, Exercise, ExerciseCreate, ExerciseRead, ExerciseUpdate, User
 from auth import auth_router, get_current_user, get_current_admin, get_optional_user
 from routers.ai import router as ai_router
+from routers.search import router as search_router
+from routers.bulk import router as bulk_router
+from rate_limit import rate_limit, run_scheduler
+import sandbox
+import search
+
+startup.mark("imports")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    with startup.timed("schema_check"):
+        create_db_and_tables()
+    startup.mark("ready")
+    print(f"Startup report: {startup.report()}")
     yield
 
 app = FastAPI(title="Coding Exercise App API", lifespan=lifespan)
 app.include_router(auth_router)
 app.include_router(ai_router)
+app.include_router(search_router)
+app.include_router(bulk_router)
 
 # CORS Setup
 origins = [
@@ -41,17 +53,25 @@ app.add_middleware(
 class CodeSubmission(BaseModel):
     code: str
     language: str = "python"
+    # Extra files next to the entry point (fixtures, helper modules), by relative path
+    files: Dict[str, str] = {}
 
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Coding App Backend Running"}
 
+@app.get("/health/startup")
+def startup_report():
+    return startup.report()
+
 # --- Admin / Course Routes ---
 
 @app.post("/courses/", response_model=CourseRead)
 def create_course(course: CourseCreate, session: Session = Depends(get_session), admin: User = Depends(get_current_admin)):
     db_course = Course.from_orm(course)
     session.add(db_course)
+    session.flush()
+    search.index_course(session, db_course)
     session.commit()
     session.refresh(db_course)
     return db_course
@@ -73,6 +93,7 @@ def delete_course(course_id: int, session: Session = Depends(get_session), admin
     course = session.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
+    search.remove_course(session, course_id)
     session.delete(course)
     session.commit()
     return None
@@ -88,6 +109,8 @@ def create_exercise_for_course(
     db_exercise = Exercise.from_orm(exercise)
     db_exercise.course_id = course_id
     session.add(db_exercise)
+    session.flush()
+    search.index_exercise(session, db_exercise)
     session.commit()
     session.refresh(db_exercise)
     return db_exercise
@@ -101,6 +124,7 @@ def delete_exercise(
     exercise = session.get(Exercise, exercise_id)
     if not exercise or exercise.course_id != course_id:
         raise HTTPException(status_code=404, detail="Exercise not found")
+    search.remove_exercise(session, exercise_id)
     session.delete(exercise)
     session.commit()
     return None
@@ -122,14 +146,29 @@ def update_exercise(
         setattr(db_exercise, key, value)
         
     session.add(db_exercise)
+    search.index_exercise(session, db_exercise)
     session.commit()
     session.refresh(db_exercise)
     return db_exercise
 
 @app.post("/run")
-def run_code(submission: CodeSubmission, user: User = Depends(get_optional_user)):
+def run_code(
+    submission: CodeSubmission,
+    user: User = Depends(get_optional_user),
+    caller: str = Depends(rate_limit("run")),
+):
+    # Queued runs are interleaved across callers rather than served FIFO
+    with run_scheduler.slot(caller):
+        return execute_submission(submission)
+
+def execute_submission(submission: CodeSubmission):
     # Logic: If running in Modal/Cloud, use Modal Sandbox. Else use Docker.
     execution_env = os.environ.get("EXECUTION_ENV", "docker")
+    limits = sandbox.limits_for(submission.language)
+    try:
+        files = sandbox.workspace_files(submission.language, submission.code, submission.files)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     if execution_env == "modal":
         try:
@@ -138,7 +177,9 @@ def run_code(submission: CodeSubmission, user: User = Depends(get_optional_user)
             
             # Run remotely on Modal
             # Since we are already in a Modal app, this triggers a sandbox creation
-            result = run_in_sandbox.remote(submission.code, submission.language)
+            result = run_in_sandbox.remote(
+                submission.language, sandbox.get_language(submission.language).cmd, files, limits.dict()
+            )
             return result
         except ImportError:
             raise HTTPException(status_code=500, detail="Modal backend not found")
@@ -146,47 +187,28 @@ def run_code(submission: CodeSubmission, user: User = Depends(get_optional_user)
             raise HTTPException(status_code=500, detail=str(e))
             
     # Default: Use local Docker
+    name = sandbox.container_name()
     try:
-        # Create a temp directory for the execution context
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Determine file extension and run command based on language
-            filename = "main.py"
-            cmd = ["python", "main.py"]
-            
-            if submission.language == "rust":
-                filename = "main.rs"
-                # Compile and run
-                cmd = ["sh", "-c", "rustc main.rs && ./main"]
-
-            # Write the user code
-            code_path = os.path.join(temp_dir, filename)
-            with open(code_path, "w") as f:
-                f.write(submission.code)
-            
-            # Construct docker command
-            docker_cmd = [
-                "docker", "run", "--rm",
-                "-v", f"{temp_dir}:/app",
-                "-w", "/app",
-                "sandbox-runner"
-            ] + cmd
-
-            # Run the container
-            result = subprocess.run(
-                docker_cmd,
-                capture_output=True,
-                text=True,
-                timeout=5  # 5 second timeout
-            )
-            
-            return {
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "exit_code": result.returncode
-            }
+        # The workspace is streamed to the container's stdin as a tar; the
+        # runner inside unpacks it, enforces the limits and reports the
+        # program's CPU time, peak RSS and wall time
+        result = subprocess.run(
+            sandbox.docker_command(submission.language, limits, name),
+            input=sandbox.pack_workspace(files),
+            capture_output=True,
+            timeout=limits.wall_seconds + sandbox.DOCKER_GRACE_SECONDS,
+        )
+        
+        return sandbox.parse_runner_output(
+            result.stdout.decode("utf-8", "replace"),
+            result.stderr.decode("utf-8", "replace"),
+            result.returncode,
+        )
             
     except subprocess.TimeoutExpired:
-        return {"stdout": "", "stderr": "Execution timed out", "exit_code": 124}
+        # Killing the docker client doesn't stop the container itself
+        sandbox.kill_container(name)
+        return sandbox.timeout_result()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
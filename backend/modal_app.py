@@ -1,6 +1,5 @@
 import modal
 import os
-import subprocess
 import tempfile
 
 app = modal.App("code-app")
@@ -10,6 +9,7 @@ sandbox_image = (
     modal.Image.debian_slim(python_version="3.11")
     .apt_install("rustc")
     .pip_install("numpy", "torch") # torch is pytorch
+    .add_local_python_source("sandbox_runner")
 )
 
 # Define the app image (matches backend/Dockerfile)
@@ -19,56 +19,44 @@ backend_path = os.path.dirname(__file__)
 app_image = (
     modal.Image.debian_slim(python_version="3.11")
     .pip_install("fastapi[all]", "sqlmodel", "uvicorn", "uv", "python-jose[cryptography]", "passlib[bcrypt]", "python-multipart", "google-genai")
-    .env({"EXECUTION_ENV": "modal"})
+    # Modal's proxy is the direct peer, so the caller's IP for anonymous
+    # rate limiting has to come from the X-Forwarded-For entry it appends
+    .env({"EXECUTION_ENV": "modal", "TRUSTED_PROXY_HOPS": "1"})
     .add_local_dir(web_dist_path, remote_path="/assets")
     .add_local_dir(backend_path, remote_path="/root")
 )
 
-@app.function(image=sandbox_image)
-def run_in_sandbox(code: str, language: str):
+# Programs run as "nobody": RLIMIT_NPROC is ignored for root, and Modal
+# has no equivalent of Docker's --pids-limit
+SANDBOX_UID = 65534
+
+# Container-level ceiling; per-run limits are applied by sandbox_runner.
+# No network, like Docker's --network none.
+@app.function(image=sandbox_image, cpu=1.0, memory=1024, block_network=True)
+def run_in_sandbox(language: str, cmd: list, files: dict, limits: dict = None):
     """
     Executes code in a secure Modal sandbox.
+    `files` is the whole workspace (entry point plus fixtures) by relative
+    path and `cmd` runs it; both come from sandbox.py on the host.
     """
+    import sandbox_runner
+
     print(f"Running {language} code in sandbox...")
-    
-    with tempfile.TemporaryDirectory() as temp_dir:
-        filename = "main.py"
-        cmd = ["python", "main.py"]
-        
-        if language == "rust":
-            filename = "main.rs"
-            cmd = ["sh", "-c", "rustc main.rs && ./main"]
 
-        code_path = os.path.join(temp_dir, filename)
-        with open(code_path, "w") as f:
-            f.write(code)
-            
+    # Keep the workspace in memory (tmpfs) rather than on the container disk
+    workspace_root = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    with tempfile.TemporaryDirectory(dir=workspace_root) as temp_dir:
         try:
-            # Run command with timeout
-            result = subprocess.run(
-                cmd,
-                cwd=temp_dir,
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            
-            return {
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "exit_code": result.returncode
-            }
-        except subprocess.TimeoutExpired:
-            return {
-                "stdout": "",
-                "stderr": "Execution timed out",
-                "exit_code": 124
-            }
+            sandbox_runner.write_workspace(files, temp_dir, uid=SANDBOX_UID)
+            # Enforces CPU/memory/process/output limits and reports usage
+            return sandbox_runner.run(cmd, {**(limits or {}), "run_as_uid": SANDBOX_UID}, cwd=temp_dir)
         except Exception as e:
             return {
                 "stdout": "",
                 "stderr": str(e),
-                "exit_code": 1
+                "exit_code": 1,
+                "usage": None,
+                "limit_exceeded": None,
             }
 
 # Define the volume for database persistence
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from auth import get_optional_user
+from models import User
+import shared_state
+
+# --- Budgets ---
+# (capacity, refill per second) for each route group and caller tier.
+# capacity is the burst size; refill is the sustained rate.
+BUDGETS: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "run": {
+        "anonymous": (5, 5 / 60),    # 5 runs/min
+        "student": (20, 30 / 60),    # 30 runs/min
+        "admin": (60, 120 / 60),     # 120 runs/min
+    },
+    "ai": {
+        "anonymous": (3, 3 / 60),
+        "student": (10, 10 / 60),
+        "admin": (30, 30 / 60),
+    },
+}
+
+# Number of proxies we control in front of the app (e.g. 1 on Modal).
+# Each appends the address it saw to X-Forwarded-For, so the client's
+# address is that many entries from the right; anything further left was
+# sent by the client and can't be trusted. 0 ignores the header.
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", "0"))
+
+
+# Buckets live in the shared-state store so every worker sees the same
+# budget in multi-worker mode (see shared_state.py)
+store = shared_state.create_bucket_store(os.environ.get("RATE_LIMIT_STORE"))
+
+
+# --- Dependencies ---
+
+def client_ip(request: Request) -> str:
+    if TRUSTED_PROXY_HOPS:
+        forwarded = ",".join(request.headers.getlist("x-forwarded-for"))
+        hops = [entry.strip() for entry in forwarded.split(",") if entry.strip()]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+
+def caller_identity(request: Request, user: Optional[User]) -> Tuple[str, str]:
+    """Returns (key, tier) for the caller."""
+    if user is None:
+        return f"ip:{client_ip(request)}", "anonymous"
+    tier = "admin" if user.role == "admin" else "student"
+    return f"user:{user.id}", tier
+
+
+def rate_limit(group: str):
+    """
+    Dependency factory enforcing the token bucket for `group`.
+    Returns the caller key so routes can hand it to the scheduler.
+    """
+    budgets = BUDGETS[group]
+
+    def dependency(request: Request, user: Optional[User] = Depends(get_optional_user)) -> str:
+        key, tier = caller_identity(request, user)
+        capacity, refill = budgets[tier]
+        wait = store.take(f"{group}:{key}", capacity, refill)
+        if wait > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded, please slow down",
+                headers={"Retry-After": str(int(wait) + 1)},
+            )
+        return key
+
+    return dependency
+
+
+# --- Fair-share scheduling ---
+
+class FairScheduler:
+    """
+    Caps concurrent executions and hands out free slots round-robin across
+    callers, so one caller's backlog can't starve everybody else's.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued_per_key: int = 3, max_queued: int = 16,
+                 wait_timeout: float = 30.0, host_slots: Optional[shared_state.HostSlots] = None):
+        self.max_concurrent = max_concurrent
+        # With several workers, each may use the whole cap while the slots
+        # shared through the host keep their sum within it
+        self.host_slots = host_slots
+        self.max_queued_per_key = max_queued_per_key
+        # Each queued run parks a threadpool thread, so the total is capped
+        # well below the pool size to keep other sync routes responsive
+        self.max_queued = max_queued
+        self.queued = 0
+        self.wait_timeout = wait_timeout
+        self.running = 0
+        # key -> deque of waiting tickets, in round-robin order
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, key: str):
+        self._acquire(key)
+        try:
+            token = self._acquire_host_slot()
+            try:
+                yield
+            finally:
+                if token is not None:
+                    self.host_slots.release(token)
+        finally:
+            self._release()
+
+    def _acquire_host_slot(self) -> Optional[int]:
+        if self.host_slots is None:
+            return None
+        try:
+            return self.host_slots.acquire(self.wait_timeout)
+        except TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Timed out waiting for an execution slot, please retry",
+                headers={"Retry-After": "5"},
+            )
+
+    def _acquire(self, key: str):
+        with self._cond:
+            if self.running < self.max_concurrent and not self._queues:
+                self.running += 1
+                return
+
+            if self.queued >= self.max_queued:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Execution queue is full, please retry",
+                    headers={"Retry-After": "5"},
+                )
+            queue = self._queues.get(key)
+            if queue is not None and len(queue) >= self.max_queued_per_key:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many queued executions",
+                )
+            queue = self._queues.setdefault(key, deque())
+            ticket = {"granted": False}
+            queue.append(ticket)
+            self.queued += 1
+
+            deadline = time.monotonic() + self.wait_timeout
+            try:
+                while not ticket["granted"]:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        if ticket["granted"]:
+                            break
+                        queue.remove(ticket)
+                        if not queue and self._queues.get(key) is queue:
+                            del self._queues[key]
+                        raise HTTPException(
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Timed out waiting for an execution slot, please retry",
+                            headers={"Retry-After": "5"},
+                        )
+            finally:
+                self.queued -= 1
+
+    def _release(self):
+        with self._cond:
+            self.running -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent and self._queues:
+            # Serve the key at the head, then rotate it to the back
+            key, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            ticket["granted"] = True
+            self.running += 1
+        self._cond.notify_all()
+
+
+# The concurrency cap is per host; in multi-worker mode workers share it through lock files
+MAX_CONCURRENT_RUNS = int(os.environ.get("MAX_CONCURRENT_RUNS", "4"))
+run_scheduler = FairScheduler(
+    max_concurrent=MAX_CONCURRENT_RUNS,
+    host_slots=shared_state.host_slots(MAX_CONCURRENT_RUNS, "run"),
+    max_queued_per_key=int(os.environ.get("MAX_QUEUED_RUNS_PER_USER", "3")),
+    max_queued=int(os.environ.get("MAX_QUEUED_RUNS", "16")),
+)
@@ -3,6 +3,7 @@ from pydantic import BaseModel
 from typing import Optional, Dict, Any
 from ai_service import ai_service
 from auth import get_current_admin, get_optional_user, User
+from rate_limit import rate_limit
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
@@ -15,13 +16,21 @@ class ChatRequest(BaseModel):
     context: Optional[str] = ""
 
 @router.post("/generate/exercise")
-def generate_exercise(request: GenerateExerciseRequest, admin: User = Depends(get_current_admin)):
+def generate_exercise(
+    request: GenerateExerciseRequest,
+    admin: User = Depends(get_current_admin),
+    caller: str = Depends(rate_limit("ai")),
+):
     result = ai_service.generate_exercise(request.prompt, request.language)
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
     return result
 
 @router.post("/discuss")
-def discuss_implementation(request: ChatRequest, user: Optional[User] = Depends(get_optional_user)):
+def discuss_implementation(
+    request: ChatRequest,
+    user: Optional[User] = Depends(get_optional_user),
+    caller: str = Depends(rate_limit("ai")),
+):
     response = ai_service.chat(request.message, request.context)
     return {"response": response}
@@ -0,0 +1,57 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+from database import get_session
+from auth import get_current_admin, User
+from bulk import MAX_RECORD_BYTES, ArchiveError, Importer, export_ndjson
+
+router = APIRouter(prefix="/bulk", tags=["bulk"])
+
+@router.get("/export")
+def export_courses(
+    course: Optional[List[str]] = Query(None, description="Course slug(s) to export; all if omitted"),
+    admin: User = Depends(get_current_admin),
+):
+    return StreamingResponse(
+        export_ndjson(course),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="courses.ndjson"'},
+    )
+
+@router.post("/import")
+async def import_courses(
+    request: Request,
+    chunk_size: int = Query(500, ge=1, le=5000),
+    session: Session = Depends(get_session),
+    admin: User = Depends(get_current_admin),
+):
+    """
+    Reads an NDJSON archive from the request body as it arrives and
+    upserts it in chunked transactions.
+    """
+    importer = Importer(session, chunk_size=chunk_size)
+    lines: List[str] = []
+    tail = b""
+    try:
+        async for data in request.stream():
+            tail += data
+            *complete, tail = tail.split(b"\n")
+            if len(tail) > MAX_RECORD_BYTES:
+                # An unterminated line would otherwise be buffered whole
+                raise ArchiveError(importer.line + len(lines) + len(complete) + 1,
+                                   f"record longer than {MAX_RECORD_BYTES} bytes")
+            lines.extend(line.decode("utf-8") for line in complete)
+            if len(lines) >= chunk_size:
+                await run_in_threadpool(importer.add_lines, lines)
+                lines = []
+        lines.append(tail.decode("utf-8"))
+        await run_in_threadpool(importer.add_lines, lines)
+        stats = await run_in_threadpool(importer.finish)
+    except ArchiveError as e:
+        # Earlier chunks stay committed; tell the client where to resume
+        raise HTTPException(status_code=400, detail={"error": f"Import failed at {e}", **importer.progress()})
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail={"error": "Archive must be UTF-8 encoded", **importer.progress()})
+    return stats
@@ -0,0 +1,21 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+from database import get_session
+import search as search_index
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("")
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[str] = Query(None, pattern="^(course|exercise)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_session),
+):
+    """
+    Ranked full-text search over course and exercise titles/descriptions.
+    """
+    result = search_index.search(session, q, kind=kind, limit=limit, offset=offset)
+    return {"query": q, "limit": limit, "offset": offset, **result}
@@ -0,0 +1,164 @@
+import io
+import json
+import os
+import posixpath
+import subprocess
+import tarfile
+import uuid
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+class ResourceLimits(BaseModel):
+    cpu_seconds: int = 5        # CPU time, enforced with RLIMIT_CPU
+    wall_seconds: float = 5     # wall clock, measured from process start
+    memory_mb: int = 256        # container memory cgroup / RLIMIT_AS on Modal
+    cpus: float = 1.0           # Docker CPU quota
+    pids: int = 64              # processes/threads
+    output_bytes: int = 64 * 1024  # per stream; the run is killed past this
+    file_mb: int = 64           # largest file the program may write (RLIMIT_FSIZE)
+    workspace_mb: int = 64      # tmpfs holding the source and build output
+
+class Language(BaseModel):
+    filename: str
+    cmd: List[str]
+    limits: ResourceLimits
+
+LANGUAGES: Dict[str, Language] = {
+    "python": Language(
+        filename="main.py",
+        cmd=["python", "main.py"],
+        limits=ResourceLimits(),
+    ),
+    "rust": Language(
+        filename="main.rs",
+        # Compile and run
+        cmd=["sh", "-c", "rustc main.rs && ./main"],
+        # rustc needs noticeably more headroom than the program it builds
+        limits=ResourceLimits(cpu_seconds=10, wall_seconds=15, memory_mb=1024),
+    ),
+}
+
+def get_language(language: str) -> Language:
+    return LANGUAGES.get(language, LANGUAGES["python"])
+
+def limits_for(language: str) -> ResourceLimits:
+    """
+    Per-language defaults, optionally overridden through SANDBOX_LIMITS,
+    e.g. SANDBOX_LIMITS='{"python": {"memory_mb": 512}}'.
+    """
+    limits = get_language(language).limits
+    overrides = json.loads(os.environ.get("SANDBOX_LIMITS", "{}")).get(language)
+    if overrides:
+        limits = ResourceLimits(**{**limits.dict(), **overrides})
+    return limits
+
+# The runner is passed to the container with `python3 -c`, so the sandbox
+# image doesn't need rebuilding when it changes.
+with open(os.path.join(os.path.dirname(__file__), "sandbox_runner.py")) as f:
+    RUNNER_SOURCE = f.read()
+
+# Extra host-side time allowed for container startup and teardown
+DOCKER_GRACE_SECONDS = 10
+
+# Caps on the extra files a submission may bring along
+MAX_WORKSPACE_FILES = 50
+MAX_WORKSPACE_BYTES = 1024 * 1024
+
+def workspace_files(language: str, code: str, files: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    The files making up a run: extra files (fixtures, modules) plus the
+    submission under the language's entry-point name.
+    Raises ValueError for paths that would escape the workspace or clash
+    with another file, and for workspaces over the size caps.
+    """
+    files = files or {}
+    if len(files) > MAX_WORKSPACE_FILES:
+        raise ValueError(f"Too many files (max {MAX_WORKSPACE_FILES})")
+    entry_point = get_language(language).filename
+    workspace = {entry_point: code}
+    for name, content in files.items():
+        normalized = posixpath.normpath(name) if name else ""
+        if (normalized in ("", ".") or posixpath.isabs(normalized)
+                or normalized == ".." or normalized.startswith("../")):
+            raise ValueError(f"Invalid file name: {name}")
+        if normalized in workspace:
+            raise ValueError(f"Duplicate file name: {name}")
+        workspace[normalized] = content
+
+    # A path can't be both a file and a directory ("a" and "a/b")
+    for path in workspace:
+        parent = posixpath.dirname(path)
+        while parent:
+            if parent in workspace:
+                raise ValueError(f"File name clashes with file '{parent}': {path}")
+            parent = posixpath.dirname(parent)
+
+    if sum(len(content.encode("utf-8")) for content in workspace.values()) > MAX_WORKSPACE_BYTES:
+        raise ValueError(f"Workspace too large (max {MAX_WORKSPACE_BYTES // 1024} KB)")
+    return workspace
+
+def pack_workspace(files: Dict[str, str]) -> bytes:
+    """Builds the tar stream the runner unpacks inside the container."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, content in files.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+def container_name() -> str:
+    return f"sandbox-{uuid.uuid4().hex[:12]}"
+
+def docker_command(language: str, limits: ResourceLimits, name: str) -> List[str]:
+    """
+    The workspace arrives as a tar stream on stdin and is unpacked onto a
+    tmpfs, so a run needs no host directory or bind mount.
+    The container is named so it can be killed if the run overstays.
+    """
+    runner_limits = {**limits.dict(), "rlimit_memory": False}
+    return [
+        "docker", "run", "--rm", "-i", "--name", name,
+        "--memory", f"{limits.memory_mb}m",
+        "--memory-swap", f"{limits.memory_mb}m",  # no swap on top of the limit
+        "--cpus", str(limits.cpus),
+        "--pids-limit", str(limits.pids),
+        "--network", "none",
+        "--security-opt", "no-new-privileges",
+        "--tmpfs", f"/app:rw,exec,nosuid,size={limits.workspace_mb}m",
+        "-w", "/app",
+        "sandbox-runner",
+        "python3", "-c", RUNNER_SOURCE, "--stdin-tar", json.dumps(runner_limits),
+    ] + get_language(language).cmd
+
+def parse_runner_output(stdout: str, stderr: str, returncode: int) -> Dict:
+    """
+    Decodes the runner's JSON result. If the runner itself died (e.g. the
+    container was OOM-killed), reports what we know from the outside.
+    """
+    try:
+        return json.loads(stdout)
+    except ValueError:
+        return {
+            "stdout": "",
+            "stderr": stderr or "Sandbox terminated unexpectedly",
+            "exit_code": returncode,
+            "usage": None,
+            "limit_exceeded": "memory" if returncode == 137 else None,
+        }
+
+def kill_container(name: str):
+    """Stops a container whose `docker run` client we gave up on."""
+    subprocess.run(["docker", "kill", name], capture_output=True, timeout=DOCKER_GRACE_SECONDS)
+
+def timeout_result() -> Dict:
+    return {
+        "stdout": "",
+        "stderr": "Execution timed out",
+        "exit_code": 124,
+        "usage": None,
+        "limit_exceeded": "wall",
+    }
@@ -0,0 +1,270 @@
+"""
+Runs a submission command under resource limits and reports its usage.
+
+This file runs *inside* the sandbox (Docker container or Modal function),
+so it must only use the standard library. Invoked as:
+
+    python3 sandbox_runner.py [--stdin-tar] '<limits json>' cmd [args...]
+
+With --stdin-tar, the workspace (source plus any fixtures) is read as a
+tar stream from stdin and unpacked into the working directory first, so
+the host never has to write it to disk.
+
+and prints a single JSON result to stdout:
+
+    {"stdout": ..., "stderr": ..., "exit_code": ...,
+     "usage": {"cpu_time_ms": ..., "peak_rss_kb": ..., "wall_time_ms": ...},
+     "limit_exceeded": null | "cpu" | "memory" | "wall" | "output" | "file"}
+"""
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+
+CHUNK_SIZE = 4096
+# How long to keep reading output once the program has exited; anything
+# still holding the pipes after that (e.g. a setsid'd daemon) is abandoned
+DRAIN_GRACE_SECONDS = 1.0
+
+MESSAGES = {
+    "cpu": "CPU time limit exceeded",
+    "memory": "Memory limit exceeded",
+    "output": "Output limit exceeded",
+    "file": "File size limit exceeded",
+}
+
+# cgroup v2, then v1; Docker enforces --memory through these
+OOM_EVENT_FILES = [
+    "/sys/fs/cgroup/memory.events",
+    "/sys/fs/cgroup/memory/memory.oom_control",
+]
+
+
+def _workspace_path(root, name):
+    """Resolves `name` inside `root`, refusing absolute paths and `..`."""
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(os.path.realpath(root) + os.sep):
+        raise ValueError(f"Invalid workspace path: {name}")
+    return path
+
+
+def write_workspace(files, root, uid=None):
+    """Writes {relative path: text} into root, owned by `uid` if given."""
+    for name, content in files.items():
+        path = _workspace_path(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+    if uid is not None:
+        for dirpath, _, filenames in os.walk(root):
+            os.chown(dirpath, uid, uid)
+            for filename in filenames:
+                os.chown(os.path.join(dirpath, filename), uid, uid)
+
+
+def extract_workspace(stream, root):
+    """Unpacks regular files from a tar stream; links and devices are skipped."""
+    with tarfile.open(fileobj=stream, mode="r|") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            path = _workspace_path(root, member.name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(tar.extractfile(member).read())
+
+
+def _set_limits(limits):
+    def apply():
+        cpu = int(limits.get("cpu_seconds") or 0)
+        if cpu:
+            # Soft limit sends SIGXCPU; the hard limit a second later is SIGKILL
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        memory_mb = limits.get("memory_mb")
+        # Docker enforces memory with a cgroup instead, which doesn't count
+        # reserved-but-unused address space against the program
+        if memory_mb and limits.get("rlimit_memory", True):
+            size = int(memory_mb) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (size, size))
+        pids = limits.get("pids")
+        if pids:
+            # Counted per uid and ignored for root: Docker's --pids-limit
+            # covers its root containers, elsewhere set run_as_uid
+            resource.setrlimit(resource.RLIMIT_NPROC, (int(pids), int(pids)))
+        file_mb = limits.get("file_mb")
+        if file_mb:
+            # Separate from output_bytes: compilers write binaries far larger than that
+            size = int(file_mb) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_FSIZE, (size, size))
+    return apply
+
+
+def _drop_root(limits):
+    """
+    Popen arguments switching the program to run_as_uid, so RLIMIT_NPROC
+    applies. Popen does this itself: setuid() from preexec_fn isn't safe
+    in a process with threads.
+    """
+    uid = limits.get("run_as_uid")
+    if uid is None:
+        return {}
+    return {"user": int(uid), "group": int(uid), "extra_groups": []}
+
+
+def _oom_kills():
+    """The container cgroup's OOM kill count, or None outside a cgroup we can read."""
+    for path in OOM_EVENT_FILES:
+        try:
+            with open(path) as f:
+                for line in f:
+                    key, _, value = line.partition(" ")
+                    if key == "oom_kill":
+                        return int(value)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def _drain(pipe, buf, limit, on_overflow):
+    """Reads pipe into buf up to `limit` bytes; calls on_overflow past that."""
+    size = 0
+    fd = pipe.fileno()
+    while True:
+        # os.read returns whatever is available; pipe.read() would wait for a
+        # full chunk, losing the tail if we stop waiting on the reader
+        chunk = os.read(fd, CHUNK_SIZE)
+        if not chunk:
+            break
+        if size < limit:
+            buf.append(chunk[: limit - size])
+        size += len(chunk)
+        if size > limit:
+            on_overflow()
+    pipe.close()
+
+
+def _kill(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _oom_killed(oom_before, limits):
+    """Whether an unexplained SIGKILL came from the memory cgroup."""
+    oom_after = _oom_kills()
+    if oom_before is not None and oom_after is not None:
+        return oom_after > oom_before
+    # Can't tell; without RLIMIT_AS the cgroup is the likely killer
+    return not limits.get("rlimit_memory", True)
+
+
+def run(cmd, limits, cwd=None):
+    output_limit = int(limits.get("output_bytes") or 64 * 1024)
+    wall_limit = float(limits.get("wall_seconds") or 5)
+    exceeded = []
+
+    oom_before = _oom_kills()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        preexec_fn=_set_limits(limits),
+        **_drop_root(limits),
+        start_new_session=True,  # own process group, so the whole tree can be killed
+    )
+
+    def overflow():
+        if not exceeded:
+            exceeded.append("output")
+        _kill(proc)
+
+    stdout, stderr = [], []
+    # Daemon threads: a reader stuck on a pipe held open by an escaped
+    # process must not keep the runner alive
+    readers = [
+        threading.Thread(target=_drain, args=(proc.stdout, stdout, output_limit, overflow), daemon=True),
+        threading.Thread(target=_drain, args=(proc.stderr, stderr, output_limit, overflow), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    # wait4 gives us the child's rusage (including its reaped descendants)
+    waited = {}
+
+    def wait():
+        _, status, usage = os.wait4(proc.pid, 0)
+        waited["status"], waited["usage"] = status, usage
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    waiter.join(wall_limit)
+    if waiter.is_alive():
+        exceeded.append("wall")
+        _kill(proc)
+        waiter.join()
+    wall = time.perf_counter() - start
+    # Background processes left behind would otherwise hold the pipes open
+    _kill(proc)
+    deadline = time.perf_counter() + DRAIN_GRACE_SECONDS
+    for reader in readers:
+        reader.join(max(0.0, deadline - time.perf_counter()))
+
+    status, usage = waited["status"], waited["usage"]
+    cpu_time = usage.ru_utime + usage.ru_stime
+    cpu_limit = float(limits.get("cpu_seconds") or 0)
+    if os.WIFSIGNALED(status):
+        sig = os.WTERMSIG(status)
+        exit_code = 128 + sig
+        hit_cpu_limit = sig == signal.SIGXCPU or (sig == signal.SIGKILL and cpu_limit and cpu_time >= cpu_limit)
+        if not exceeded and hit_cpu_limit:
+            exceeded.append("cpu")
+        elif not exceeded and sig == signal.SIGXFSZ:
+            exceeded.append("file")
+        elif not exceeded and sig == signal.SIGKILL and _oom_killed(oom_before, limits):
+            exceeded.append("memory")
+    else:
+        exit_code = os.WEXITSTATUS(status)
+    proc.returncode = exit_code
+    # Python reports MemoryError when RLIMIT_AS is hit; native code usually aborts
+    stderr_text = b"".join(stderr).decode("utf-8", "replace")
+    if not exceeded and "MemoryError" in stderr_text:
+        exceeded.append("memory")
+    # Likewise Python ignores SIGXFSZ, so the write fails with EFBIG instead
+    elif not exceeded and "File too large" in stderr_text:
+        exceeded.append("file")
+
+    if exceeded == ["wall"]:
+        exit_code = 124
+        stderr_text += "\nExecution timed out"
+    elif exceeded:
+        stderr_text += f"\n{MESSAGES[exceeded[0]]}"
+
+    return {
+        "stdout": b"".join(stdout).decode("utf-8", "replace"),
+        "stderr": stderr_text,
+        "exit_code": exit_code,
+        "usage": {
+            "cpu_time_ms": round(cpu_time * 1000, 1),
+            "peak_rss_kb": usage.ru_maxrss,  # kilobytes on Linux
+            "wall_time_ms": round(wall * 1000, 1),
+        },
+        "limit_exceeded": exceeded[0] if exceeded else None,
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[0] == "--stdin-tar":
+        args = args[1:]
+        extract_workspace(sys.stdin.buffer, os.getcwd())
+    result = run(args[1:], json.loads(args[0]))
+    sys.stdout.write(json.dumps(result))
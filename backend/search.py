@@ -0,0 +1,257 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from models import Course, Exercise
+
+# Single FTS5 table holding both courses and exercises.
+# `kind`, `ref_id` and `course_id` are stored but not tokenized.
+# The prefix index serves the trailing prefix match of short (typed so far)
+# words, which would otherwise merge the doclists of every matching term.
+CREATE_INDEX_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    kind UNINDEXED,
+    ref_id UNINDEXED,
+    course_id UNINDEXED,
+    title,
+    description,
+    tokenize = 'porter unicode61 remove_diacritics 2',
+    prefix = '2 3 4 5 6'
+)
+"""
+
+# bm25() weights per column: title matches rank above description matches
+RANK_SQL = "bm25(search_index, 0.0, 0.0, 0.0, 10.0, 1.0)"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Matches considered per query: broad terms ("rust") are ranked within the
+# first MAX_MATCHES matches in index order, so they cost about the same as
+# narrow ones. `total` stops here too; users refine the query instead.
+MAX_MATCHES = 500
+
+# Words of context in a result snippet
+SNIPPET_WORDS = 16
+
+
+def is_supported(session_or_engine) -> bool:
+    bind = session_or_engine.get_bind() if isinstance(session_or_engine, Session) else session_or_engine
+    return bind.dialect.name == "sqlite"
+
+
+def create_search_index(engine):
+    """
+    Creates the FTS5 table if missing (or defined differently, e.g. by an
+    older version) and backfills it from existing rows.
+    No-op on non-SQLite databases (search falls back to LIKE queries).
+    """
+    if not is_supported(engine):
+        return
+    with Session(engine) as session:
+        existing = session.exec(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+        ).first()
+        if existing and _definition(existing[0]) == _definition(CREATE_INDEX_SQL):
+            return
+        if existing:
+            session.exec(text("DROP TABLE search_index"))
+        session.exec(text(CREATE_INDEX_SQL))
+        rebuild_index(session)
+        session.commit()
+
+
+def _definition(sql: str) -> str:
+    # The module arguments, whitespace-insensitive
+    return " ".join(sql[sql.index("fts5("):].split())
+
+
+def rebuild_index(session: Session):
+    """Repopulates the whole index. Caller is responsible for committing."""
+    session.exec(text("DELETE FROM search_index"))
+    # Only the indexed columns, so this works on databases that are behind on migrations
+    for course in session.exec(select(Course.id, Course.title, Course.description)):
+        _insert(session, "course", course.id, course.id, course.title, course.description)
+    for exercise in session.exec(select(Exercise.id, Exercise.course_id, Exercise.title, Exercise.description)):
+        _insert(session, "exercise", exercise.id, exercise.course_id, exercise.title, exercise.description)
+
+
+def _rowid(kind: str, ref_id: int) -> int:
+    # Deterministic rowids let updates/deletes hit the rowid b-tree
+    # instead of scanning the (unindexed) kind/ref_id columns.
+    return ref_id * 2 + (1 if kind == "exercise" else 0)
+
+
+def _insert(session: Session, kind: str, ref_id: int, course_id: Optional[int], title: str, description: str):
+    session.exec(
+        text(
+            "INSERT INTO search_index (rowid, kind, ref_id, course_id, title, description) "
+            "VALUES (:rowid, :kind, :ref_id, :course_id, :title, :description)"
+        ),
+        params={
+            "rowid": _rowid(kind, ref_id),
+            "kind": kind,
+            "ref_id": ref_id,
+            "course_id": course_id,
+            "title": title,
+            "description": description,
+        },
+    )
+
+
+def _delete(session: Session, kind: str, ref_id: int):
+    session.exec(
+        text("DELETE FROM search_index WHERE rowid = :rowid"),
+        params={"rowid": _rowid(kind, ref_id)},
+    )
+
+
+# --- Incremental updates ---
+# These run inside the caller's transaction (after a flush, so ids exist),
+# so the index is committed or rolled back together with the row itself.
+
+def index_course(session: Session, course: Course):
+    if not is_supported(session):
+        return
+    _delete(session, "course", course.id)
+    _insert(session, "course", course.id, course.id, course.title, course.description)
+
+
+def index_exercise(session: Session, exercise: Exercise):
+    if not is_supported(session):
+        return
+    _delete(session, "exercise", exercise.id)
+    _insert(session, "exercise", exercise.id, exercise.course_id, exercise.title, exercise.description)
+
+
+def remove_course(session: Session, course_id: int):
+    """Removes the course and every exercise indexed under it."""
+    if not is_supported(session):
+        return
+    session.exec(
+        text("DELETE FROM search_index WHERE course_id = :course_id"),
+        params={"course_id": course_id},
+    )
+
+
+def remove_exercise(session: Session, exercise_id: int):
+    if not is_supported(session):
+        return
+    _delete(session, "exercise", exercise_id)
+
+
+# --- Queries ---
+
+def build_match_query(query: str) -> str:
+    """
+    Turns free text into a safe FTS5 expression: every word is quoted
+    (so user input can't inject FTS syntax) and the last one is a prefix match.
+    """
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return ""
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(session: Session, query: str, kind: Optional[str] = None, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """
+    Ranked matches, best first. `total` is capped at MAX_MATCHES and
+    `has_more` tells whether another page exists.
+    """
+    if not is_supported(session):
+        return _search_like(session, query, kind, limit, offset)
+
+    match = build_match_query(query)
+    if not match:
+        return {"total": 0, "has_more": False, "results": []}
+
+    where = "search_index MATCH :match"
+    params: Dict[str, Any] = {"match": match, "limit": limit, "offset": offset, "max_matches": MAX_MATCHES}
+    if kind:
+        where += " AND kind = :kind"
+        params["kind"] = kind
+
+    total = session.exec(
+        text(f"SELECT count(*) FROM (SELECT 1 FROM search_index WHERE {where} LIMIT :max_matches)"),
+        params=params,
+    ).one()[0]
+    # bm25 is computed inside the window only; snippets are built for the
+    # returned page alone, since snippet() over every match dominates the cost
+    rows = session.exec(
+        text(
+            f"SELECT * FROM ("
+            f"SELECT kind, ref_id, course_id, title, description, {RANK_SQL} AS score "
+            f"FROM search_index WHERE {where} LIMIT :max_matches"
+            f") ORDER BY score LIMIT :limit OFFSET :offset"
+        ),
+        params=params,
+    ).all()
+
+    terms = [_fold(token) for token in TOKEN_RE.findall(query)]
+    results: List[Dict[str, Any]] = [
+        {
+            "kind": row.kind,
+            "id": row.ref_id,
+            "course_id": row.course_id,
+            "title": row.title,
+            "snippet": snippet(row.description, terms),
+            # bm25 is "lower is better"; flip it so clients can sort descending
+            "score": -row.score,
+        }
+        for row in rows
+    ]
+    return {"total": total, "has_more": offset + len(results) < total, "results": results}
+
+
+def _fold(word: str) -> str:
+    # Same folding as the unicode61 tokenizer with remove_diacritics
+    if word.isascii():
+        return word.lower()
+    decomposed = unicodedata.normalize("NFKD", word.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def snippet(textual: str, terms: List[str], words: int = SNIPPET_WORDS) -> str:
+    """
+    Up to `words` words of `textual` from around the first word starting
+    with one of `terms`, matches wrapped in <mark> like FTS5's snippet().
+    Prefix matching stands in for the index's stemming.
+    """
+    prefixes = tuple(terms)
+    tokens = list(TOKEN_RE.finditer(textual))
+    if not tokens:
+        return ""
+    hit = next((i for i, m in enumerate(tokens) if _fold(m.group()).startswith(prefixes)), 0)
+    first = max(0, min(hit - 2, len(tokens) - words))
+    window = tokens[first:first + words]
+    out, pos = [], window[0].start()
+    for m in window:
+        word = m.group()
+        out.append(textual[pos:m.start()])
+        out.append(f"<mark>{word}</mark>" if _fold(word).startswith(prefixes) else word)
+        pos = m.end()
+    prefix = "..." if first > 0 else ""
+    suffix = "..." if first + words < len(tokens) else textual[pos:]
+    return prefix + "".join(out) + suffix
+
+
+def _search_like(session: Session, query: str, kind: Optional[str], limit: int, offset: int) -> Dict[str, Any]:
+    """Unranked fallback for databases without FTS5."""
+    pattern = f"%{query}%"
+    results: List[Dict[str, Any]] = []
+    if kind in (None, "course"):
+        for course in session.exec(
+            select(Course).where(Course.title.ilike(pattern) | Course.description.ilike(pattern))
+        ):
+            results.append({"kind": "course", "id": course.id, "course_id": course.id,
+                            "title": course.title, "snippet": "", "score": 0.0})
+    if kind in (None, "exercise"):
+        for exercise in session.exec(
+            select(Exercise).where(Exercise.title.ilike(pattern) | Exercise.description.ilike(pattern))
+        ):
+            results.append({"kind": "exercise", "id": exercise.id, "course_id": exercise.course_id,
+                            "title": exercise.title, "snippet": "", "score": 0.0})
+    return {"total": len(results), "has_more": offset + limit < len(results), "results": results[offset:offset + limit]}
@@ -0,0 +1,33 @@
+"""
+Multi-worker launcher.
+
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8000]
+
+Runs the schema check once up front, then starts N uvicorn worker
+processes in DEPLOYMENT_MODE=multi, where rate-limit buckets are shared
+through a SQLite file and the sandbox concurrency cap is enforced
+host-wide through lock files (see shared_state.py).
+"""
+import argparse
+import os
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    # Must be set before the app modules are imported; workers inherit them
+    os.environ["DEPLOYMENT_MODE"] = "multi"
+
+    # Once here, so workers starting together don't race on CREATE TABLE
+    from database import create_db_and_tables, engine
+    create_db_and_tables()
+    engine.dispose()
+
+    import uvicorn
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+State that must be consistent across worker processes.
+
+DEPLOYMENT_MODE=single (default) keeps everything in-process.
+DEPLOYMENT_MODE=multi (set by serve.py) moves shared state into files
+under STATE_DIR: rate-limit buckets in a SQLite database, and per-host
+caps in lock files every worker competes for.
+
+Other backends (e.g. Redis for several Modal replicas) plug in with
+register_backend("redis", factory); the factory gets the store URL and
+returns a BucketStore.
+"""
+import fcntl
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+DEPLOYMENT_MODE = os.environ.get("DEPLOYMENT_MODE", "single")
+# Defaults to a per-user directory: fixed names directly in a world-writable
+# /tmp could be created first by another user, failing every request
+_DEFAULT_STATE_DIR = os.path.join(tempfile.gettempdir(), f"code-app-{os.getuid()}")
+STATE_DIR = os.environ.get("STATE_DIR") or _DEFAULT_STATE_DIR
+
+
+def is_multi_worker() -> bool:
+    return DEPLOYMENT_MODE == "multi"
+
+
+def state_dir() -> str:
+    """Creates STATE_DIR if needed. The default one must be private to this user."""
+    os.makedirs(STATE_DIR, mode=0o700, exist_ok=True)
+    if STATE_DIR == _DEFAULT_STATE_DIR:
+        info = os.lstat(STATE_DIR)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise RuntimeError(
+                f"{STATE_DIR} must be a directory owned by this user with mode 0700; "
+                f"remove it or set STATE_DIR"
+            )
+    return STATE_DIR
+
+
+# --- Host-wide slots ---
+
+class HostSlots:
+    """
+    A counting semaphore shared by every process on the host: one lock
+    file per slot, held with flock while in use. The kernel drops the lock
+    if a worker dies, so crashed runs can't leak slots.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, size: int, name: str, directory: Optional[str] = None):
+        directory = directory or state_dir()
+        self.paths = [os.path.join(directory, f"code-app-{name}-{i}.lock") for i in range(size)]
+
+    def _try_acquire(self) -> Optional[int]:
+        for path in self.paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def acquire(self, timeout: float) -> int:
+        """Returns a token for release(); raises TimeoutError if no slot frees up in time."""
+        deadline = time.monotonic() + timeout
+        fd = self._try_acquire()
+        while fd is None:
+            if time.monotonic() >= deadline:
+                raise TimeoutError("no free host slot")
+            time.sleep(self.POLL_INTERVAL)
+            fd = self._try_acquire()
+        return fd
+
+    def release(self, token: int):
+        os.close(token)  # drops the flock
+
+
+def host_slots(size: int, name: str) -> Optional[HostSlots]:
+    """Slots shared between workers in multi-worker mode; None when one process owns the cap."""
+    return HostSlots(size, name) if is_multi_worker() else None
+
+
+# --- Token bucket stores ---
+
+class BucketStore(ABC):
+    """Interface for rate-limit buckets."""
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, refill: float, now: Optional[float] = None) -> float:
+        """
+        Takes one token. Returns 0 on success, otherwise the seconds
+        until a token will be available.
+        """
+
+
+class MemoryBucketStore(BucketStore):
+    """
+    Token buckets held in this process. Fine for a single worker.
+
+    A bucket that has refilled completely is indistinguishable from a new
+    one, so those are swept out periodically; past `max_keys` the least
+    recently used buckets are dropped as well.
+    """
+
+    def __init__(self, url: str = "memory", max_keys: int = 100_000, sweep_interval: float = 60.0):
+        # key -> (tokens, updated, time at which the bucket is full again)
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self._next_sweep = None
+
+    def take(self, key: str, capacity: float, refill: float, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated, _ = self._buckets.pop(key, (capacity, now, now))
+            tokens, wait = _take(tokens, updated, now, capacity, refill)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill)
+            self._evict(now)
+            return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float):
+        if self._next_sweep is None:
+            self._next_sweep = now + self.sweep_interval
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            for key in [k for k, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+                del self._buckets[key]
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+
+class SQLiteBucketStore(BucketStore):
+    """
+    Token buckets shared by every worker on the host through a SQLite file.
+    Each take() is a single IMMEDIATE transaction, so concurrent workers
+    serialize on the write lock instead of racing.
+    """
+
+    SWEEP_INTERVAL = 300.0
+    IDLE_SECONDS = 3600.0
+    # The write lock is held for microseconds, so waiting for it is a tight
+    # retry loop; SQLite's own busy handler backs off in 1-100 ms sleeps,
+    # which under contention stalled requests for up to a second
+    LOCK_TIMEOUT = 5.0
+    LOCK_RETRY_SECONDS = 0.0002
+
+    def __init__(self, url: str):
+        self.path = url[len("sqlite:///"):]
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_bucket ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections aren't thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=0")  # see _begin()
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: float, refill: float, now: Optional[float] = None) -> float:
+        # Wall-clock time: monotonic clocks aren't comparable across processes
+        now = time.time() if now is None else now
+        conn = self._connect()
+        self._begin(conn)
+        try:
+            if now >= self._next_sweep:
+                # Every budget refills well within IDLE_SECONDS, so idle rows are full
+                self._next_sweep = now + self.SWEEP_INTERVAL
+                conn.execute("DELETE FROM rate_bucket WHERE updated < ?", (now - self.IDLE_SECONDS,))
+            row = conn.execute("SELECT tokens, updated FROM rate_bucket WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, wait = _take(tokens, updated, now, capacity, refill)
+            conn.execute(
+                "INSERT INTO rate_bucket (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def _begin(self, conn: sqlite3.Connection):
+        deadline = time.monotonic() + self.LOCK_TIMEOUT
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or time.monotonic() >= deadline:
+                    raise
+            time.sleep(self.LOCK_RETRY_SECONDS)
+
+
+def _take(tokens: float, updated: float, now: float, capacity: float, refill: float) -> Tuple[float, float]:
+    tokens = min(capacity, tokens + max(0.0, now - updated) * refill)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / refill
+
+
+# URL scheme -> factory(url)
+BACKENDS: Dict[str, Callable[[str], BucketStore]] = {
+    "memory": MemoryBucketStore,
+    "sqlite": SQLiteBucketStore,
+}
+
+
+def register_backend(scheme: str, factory: Callable[[str], BucketStore]):
+    BACKENDS[scheme] = factory
+
+
+def default_store_url() -> str:
+    if is_multi_worker():
+        return f"sqlite:///{os.path.join(state_dir(), 'code-app-state.db')}"
+    return "memory"
+
+
+def create_bucket_store(url: Optional[str] = None) -> BucketStore:
+    """
+    `url` is "memory", "sqlite:///path/to/file.db", or any scheme added
+    with register_backend(). Defaults depend on the deployment mode.
+    """
+    url = url or default_store_url()
+    scheme = url.split(":", 1)[0]
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unknown state store '{scheme}' (known: {', '.join(BACKENDS)})")
+    return BACKENDS[scheme](url)
@@ -0,0 +1,37 @@
+"""
+Records how long each phase of process startup takes.
+
+Imported first by main, so "imports" covers everything main pulls in.
+Lazily-loaded dependencies record their import time on first use.
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+_started = time.perf_counter()
+
+# phase name -> milliseconds
+timings: Dict[str, float] = {}
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def mark(name: str):
+    """Records the time elapsed since startup began."""
+    timings[name] = _ms(time.perf_counter() - _started)
+
+
+@contextmanager
+def timed(name: str):
+    """Records how long the wrapped block takes."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = _ms(time.perf_counter() - start)
+
+
+def report() -> Dict[str, object]:
+    return {"uptime_ms": _ms(time.perf_counter() - _started), "phases_ms": dict(timings)}
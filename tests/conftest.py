@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Point the app at a scratch database before any backend module creates its engine
+_scratch = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+@pytest.fixture
+def session():
+    from sqlalchemy import text
+    from sqlmodel import Session
+    from database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        yield session
+        session.rollback()
+        for table in ("search_index", "exercise", "course"):
+            session.exec(text(f"DELETE FROM {table}"))
+        session.commit()
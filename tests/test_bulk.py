@@ -0,0 +1,100 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from auth import get_current_admin
+from bulk import ArchiveError, Importer
+from database import get_session
+from models import Course, Exercise
+import routers.bulk
+
+
+def ndjson(*records):
+    return [json.dumps(record) for record in records]
+
+
+COURSE = {"type": "course", "slug": "rust", "title": "Rust", "description": "Systems programming"}
+
+
+def exercise(slug, **fields):
+    return {"type": "exercise", "course_slug": "rust", "slug": slug,
+            "title": slug.title(), "description": f"About {slug}", **fields}
+
+
+def test_import_creates_then_updates(session):
+    importer = Importer(session)
+    importer.add_lines(ndjson(COURSE, exercise("ownership", order=1), exercise("borrowing", order=2)))
+    assert importer.finish() == {"courses_created": 1, "courses_updated": 0,
+                                 "exercises_created": 2, "exercises_updated": 0}
+
+    importer = Importer(session)
+    importer.add_lines(ndjson({**COURSE, "title": "Rust 101"}, exercise("ownership", order="5")))
+    assert importer.finish() == {"courses_created": 0, "courses_updated": 1,
+                                 "exercises_created": 0, "exercises_updated": 1}
+
+    assert session.exec(select(Course.title)).all() == ["Rust 101"]
+    ownership = session.exec(select(Exercise).where(Exercise.slug == "ownership")).one()
+    assert ownership.order == 5
+    # Fields absent from the record are left as they were
+    assert ownership.description == "About ownership"
+
+
+def test_import_rejects_unknown_course(session):
+    importer = Importer(session)
+    with pytest.raises(ArchiveError) as e:
+        importer.add_lines(ndjson(exercise("ownership")))
+        importer.finish()
+    assert e.value.line == 1
+    assert "unknown course 'rust'" in str(e.value)
+
+
+def test_import_rejects_invalid_json(session):
+    importer = Importer(session)
+    with pytest.raises(ArchiveError) as e:
+        importer.add_lines([json.dumps(COURSE), "{not json"])
+    assert e.value.line == 2
+
+
+def test_import_validates_field_types(session):
+    importer = Importer(session)
+    with pytest.raises(ArchiveError) as e:
+        importer.add_lines(ndjson(COURSE, exercise("ownership", order="abc")))
+        importer.finish()
+    assert e.value.line == 2
+    assert "order" in str(e.value)
+    assert session.exec(select(Exercise)).all() == []
+
+
+def test_failed_chunk_reports_committed_progress(session):
+    importer = Importer(session, chunk_size=2)
+    with pytest.raises(ArchiveError) as e:
+        importer.add_lines(ndjson(COURSE, exercise("a"), exercise("b"), exercise("c", order=[])))
+        importer.finish()
+    assert e.value.line == 4
+    assert importer.progress() == {
+        "committed_chunks": 1, "committed_through_line": 2,
+        "courses_created": 1, "courses_updated": 0, "exercises_created": 1, "exercises_updated": 0,
+    }
+    assert session.exec(select(Exercise.slug)).all() == ["a"]
+
+
+def test_import_endpoint_rejects_unterminated_oversized_record(session, monkeypatch):
+    monkeypatch.setattr(routers.bulk, "MAX_RECORD_BYTES", 1000)
+    app = FastAPI()
+    app.include_router(routers.bulk.router)
+    app.dependency_overrides[get_current_admin] = lambda: None
+    app.dependency_overrides[get_session] = lambda: session
+
+    def body():
+        yield (json.dumps(COURSE) + "\n").encode()
+        for _ in range(100):
+            yield b"x" * 100
+
+    response = TestClient(app).post("/bulk/import", content=body())
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert "line 2" in detail["error"]
+    assert detail["committed_chunks"] == 0
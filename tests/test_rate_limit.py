@@ -0,0 +1,239 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+import rate_limit
+from rate_limit import FairScheduler
+import shared_state
+from shared_state import BucketStore, HostSlots, MemoryBucketStore, SQLiteBucketStore, _take
+
+
+def test_take_spends_a_token_when_available():
+    assert _take(3, 0, 0, capacity=3, refill=1) == (2, 0.0)
+
+
+def test_take_refills_over_time_up_to_capacity():
+    tokens, wait = _take(0, 0, 10, capacity=3, refill=1)
+    assert (tokens, wait) == (2, 0.0)
+
+
+def test_take_reports_wait_until_next_token():
+    tokens, wait = _take(0.25, 0, 0, capacity=3, refill=0.5)
+    assert tokens == 0.25
+    assert wait == pytest.approx(1.5)
+
+
+def test_memory_store_limits_burst_then_refills():
+    store = MemoryBucketStore()
+    assert [store.take("k", 2, 1, now=0) for _ in range(3)] == [0.0, 0.0, 1.0]
+    assert store.take("k", 2, 1, now=1) == 0.0
+
+
+def test_memory_store_sweeps_refilled_buckets():
+    store = MemoryBucketStore(sweep_interval=10)
+    for i in range(100):
+        store.take(f"ip:{i}", 5, 1, now=0)
+    store.take("late", 5, 1, now=11)
+    assert len(store) == 1
+
+
+def test_memory_store_caps_number_of_keys():
+    store = MemoryBucketStore(max_keys=10)
+    for i in range(50):
+        store.take(f"ip:{i}", 5, 1, now=0)
+    assert len(store) == 10
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    url = f"sqlite:///{tmp_path / 'state.db'}"
+    first, second = SQLiteBucketStore(url), SQLiteBucketStore(url)
+    assert first.take("k", 1, 0.5, now=100) == 0.0
+    assert second.take("k", 1, 0.5, now=100) == pytest.approx(2.0)
+
+
+def test_sqlite_store_waits_briefly_for_the_write_lock(tmp_path):
+    url = f"sqlite:///{tmp_path / 'state.db'}"
+    store = SQLiteBucketStore(url)
+    blocker = sqlite3.connect(str(tmp_path / "state.db"), isolation_level=None, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.05, lambda: blocker.execute("COMMIT")).start()
+    assert store.take("k", 1, 1, now=0) == 0.0
+
+    blocker.execute("BEGIN IMMEDIATE")
+    store.LOCK_TIMEOUT = 0.05
+    with pytest.raises(sqlite3.OperationalError):
+        store.take("k", 1, 1, now=0)
+    blocker.execute("COMMIT")
+
+
+def test_bucket_store_requires_take():
+    class Incomplete(BucketStore):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_default_state_dir_is_private(tmp_path, monkeypatch):
+    path = str(tmp_path / "state")
+    monkeypatch.setattr(shared_state, "STATE_DIR", path)
+    monkeypatch.setattr(shared_state, "_DEFAULT_STATE_DIR", path)
+    assert shared_state.state_dir() == path
+    assert os.stat(path).st_mode & 0o777 == 0o700
+
+    # e.g. created beforehand by someone else in a shared /tmp
+    os.chmod(path, 0o777)
+    with pytest.raises(RuntimeError):
+        shared_state.state_dir()
+
+
+def test_host_slots_are_shared_between_instances(tmp_path):
+    # Separate instances open separate file descriptions, like separate workers
+    first, second = HostSlots(2, "run", str(tmp_path)), HostSlots(2, "run", str(tmp_path))
+    tokens = [first.acquire(0), second.acquire(0)]
+    with pytest.raises(TimeoutError):
+        second.acquire(0.1)
+    first.release(tokens[0])
+    second.release(second.acquire(0))
+    first.release(tokens[1])
+
+
+def test_schedulers_on_one_host_share_the_cap(tmp_path):
+    busy = FairScheduler(max_concurrent=2, host_slots=HostSlots(2, "run", str(tmp_path)))
+    idle = FairScheduler(max_concurrent=2, wait_timeout=0.1, host_slots=HostSlots(2, "run", str(tmp_path)))
+    with busy.slot("a"), busy.slot("b"):
+        with pytest.raises(HTTPException) as exc:
+            with idle.slot("c"):
+                pass
+        assert exc.value.status_code == 503
+        assert idle.running == 0
+    with idle.slot("c"):
+        assert idle.running == 1
+
+
+def test_spoofed_forwarded_for_does_not_reset_the_budget(monkeypatch):
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXY_HOPS", 1)
+    monkeypatch.setattr(rate_limit, "store", MemoryBucketStore())
+    app = FastAPI()
+
+    @app.get("/limited")
+    def limited(key: str = Depends(rate_limit.rate_limit("ai"))):
+        return key
+
+    client = TestClient(app)
+    statuses = []
+    for i in range(5):
+        # The client made up the first entry; the proxy appended the second
+        response = client.get("/limited", headers={"X-Forwarded-For": f"6.6.6.{i}, 9.9.9.9"})
+        statuses.append(response.status_code)
+    assert statuses == [200, 200, 200, 429, 429]
+    assert response.headers["Retry-After"]
+
+
+def test_client_ip_counts_trusted_hops_from_the_right(monkeypatch):
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXY_HOPS", 2)
+    app = FastAPI()
+
+    @app.get("/ip")
+    def ip(request: Request):
+        return rate_limit.client_ip(request)
+
+    client = TestClient(app)
+
+    assert client.get("/ip", headers={"X-Forwarded-For": "1.1.1.1, 2.2.2.2, 3.3.3.3"}).json() == "2.2.2.2"
+    # Fewer entries than trusted proxies: the header is bogus, use the peer
+    assert client.get("/ip", headers={"X-Forwarded-For": "1.1.1.1"}).json() == "testclient"
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_scheduler_interleaves_queued_callers():
+    scheduler = FairScheduler(max_concurrent=1, max_queued_per_key=5)
+    gate = threading.Event()
+    order = []
+
+    def hold():
+        with scheduler.slot("holder"):
+            gate.wait()
+
+    def job(key):
+        with scheduler.slot(key):
+            order.append(key)
+
+    threads = [threading.Thread(target=hold)]
+    threads[0].start()
+    _wait_for(lambda: scheduler.running == 1)
+    for key in ["A", "A", "A", "B", "B"]:
+        threads.append(threading.Thread(target=job, args=(key,)))
+        threads[-1].start()
+        expected = len(threads) - 1
+        _wait_for(lambda: scheduler.queued == expected)
+
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert order == ["A", "B", "A", "B", "A"]
+
+
+def test_scheduler_times_out_waiting_callers():
+    scheduler = FairScheduler(max_concurrent=1, wait_timeout=0.05)
+    with scheduler.slot("holder"):
+        with pytest.raises(HTTPException) as exc:
+            with scheduler.slot("other"):
+                pass
+    assert exc.value.status_code == 503
+    assert scheduler.queued == 0
+    with scheduler.slot("other"):
+        assert scheduler.running == 1
+
+
+def _queue_one(scheduler):
+    """Occupies the only slot and parks one caller "q" in the queue."""
+    gate = threading.Event()
+
+    def hold():
+        with scheduler.slot("h"):
+            gate.wait()
+
+    def wait_in_queue():
+        with scheduler.slot("q"):
+            pass
+
+    threads = [threading.Thread(target=hold), threading.Thread(target=wait_in_queue)]
+    threads[0].start()
+    _wait_for(lambda: scheduler.running == 1)
+    threads[1].start()
+    _wait_for(lambda: scheduler.queued == 1)
+    return gate, threads
+
+
+def test_scheduler_rejects_caller_with_full_queue():
+    scheduler = FairScheduler(max_concurrent=1, max_queued_per_key=1, max_queued=10, wait_timeout=5)
+    gate, threads = _queue_one(scheduler)
+    with pytest.raises(HTTPException) as exc:
+        scheduler._acquire("q")
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert exc.value.status_code == 429
+
+
+def test_scheduler_rejects_everyone_when_total_queue_is_full():
+    scheduler = FairScheduler(max_concurrent=1, max_queued_per_key=5, max_queued=1, wait_timeout=5)
+    gate, threads = _queue_one(scheduler)
+    with pytest.raises(HTTPException) as exc:
+        scheduler._acquire("someone-else")
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert exc.value.status_code == 503
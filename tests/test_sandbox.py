@@ -0,0 +1,133 @@
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+import sandbox
+import sandbox_runner
+
+LIMITS = {"cpu_seconds": 2, "wall_seconds": 2, "memory_mb": 256, "output_bytes": 1024, "file_mb": 1}
+
+
+def python(source, **limits):
+    return sandbox_runner.run([sys.executable, "-c", source], {**LIMITS, **limits})
+
+
+def test_ok_run_reports_usage():
+    result = python("print('hi')")
+    assert result["stdout"] == "hi\n"
+    assert result["exit_code"] == 0
+    assert result["limit_exceeded"] is None
+    assert result["usage"]["peak_rss_kb"] > 0
+
+
+def test_cpu_limit():
+    result = python("while True: pass", cpu_seconds=1, wall_seconds=5)
+    assert result["limit_exceeded"] == "cpu"
+
+
+def test_wall_limit():
+    result = python("import time; time.sleep(10)", wall_seconds=0.5)
+    assert result["limit_exceeded"] == "wall"
+    assert result["exit_code"] == 124
+
+
+def test_background_process_does_not_hold_the_run():
+    start = time.perf_counter()
+    result = sandbox_runner.run(["sh", "-c", "(sleep 8 &); echo hi"], LIMITS)
+    assert time.perf_counter() - start < 2
+    assert result["stdout"] == "hi\n"
+    assert result["limit_exceeded"] is None
+
+
+def test_escaped_session_is_abandoned_after_grace():
+    start = time.perf_counter()
+    # The sleep lets the escaped child inherit the pipes before the echo
+    result = sandbox_runner.run(["sh", "-c", "setsid sleep 8 & sleep 0.2; echo hi"], LIMITS)
+    assert time.perf_counter() - start < 1 + sandbox_runner.DRAIN_GRACE_SECONDS
+    assert result["stdout"] == "hi\n"
+
+
+def test_output_limit():
+    result = python("print('x' * 5000)")
+    assert result["limit_exceeded"] == "output"
+    assert len(result["stdout"]) == 1024
+
+
+def test_files_larger_than_output_limit_can_be_written(tmp_path):
+    result = python(f"open({str(tmp_path / 'out.bin')!r}, 'wb').write(b'x' * 200_000)")
+    assert result["limit_exceeded"] is None
+    assert (tmp_path / "out.bin").stat().st_size == 200_000
+
+
+def test_file_size_limit(tmp_path):
+    result = python(f"open({str(tmp_path / 'out.bin')!r}, 'wb').write(b'x' * 2_000_000)")
+    assert result["limit_exceeded"] == "file"
+
+
+def test_memory_limit_with_rlimit():
+    result = python("x = bytearray(512 * 1024 * 1024)", memory_mb=128)
+    assert result["limit_exceeded"] == "memory"
+
+
+def test_cgroup_oom_kill_is_reported_as_memory(monkeypatch):
+    counts = iter([3, 4])
+    monkeypatch.setattr(sandbox_runner, "_oom_kills", lambda: next(counts))
+    result = python("import os, signal; os.kill(os.getpid(), signal.SIGKILL)", rlimit_memory=False)
+    assert result["limit_exceeded"] == "memory"
+
+
+def test_sigkill_without_oom_is_not_memory(monkeypatch):
+    monkeypatch.setattr(sandbox_runner, "_oom_kills", lambda: 3)
+    result = python("import os, signal; os.kill(os.getpid(), signal.SIGKILL)", rlimit_memory=False)
+    assert result["limit_exceeded"] is None
+
+
+FORK_TEN = "for i in 1 2 3 4 5 6 7 8 9 10; do sleep 1 & done; wait; echo done"
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason="needs root to switch users")
+def test_process_limit_applies_after_dropping_root():
+    # Under /tmp: the unprivileged user can't reach pytest's private tmp_path
+    with tempfile.TemporaryDirectory() as root:
+        sandbox_runner.write_workspace({"main.sh": FORK_TEN}, root, uid=65534)
+        assert os.stat(os.path.join(root, "main.sh")).st_uid == 65534
+        limits = {**LIMITS, "pids": 5}
+        assert sandbox_runner.run(["sh", "main.sh"], limits, cwd=root)["stdout"] == "done\n"
+
+        result = sandbox_runner.run(["sh", "main.sh"], {**limits, "run_as_uid": 65534}, cwd=root)
+        assert "Cannot fork" in result["stderr"]
+
+
+def test_workspace_files_adds_entry_point():
+    assert sandbox.workspace_files("python", "print(1)", {"./data/in.txt": "x"}) == {
+        "main.py": "print(1)", "data/in.txt": "x",
+    }
+
+
+@pytest.mark.parametrize("name", [
+    "", ".", "a/..", "/etc/passwd", "..", "../x", "a/../../x",  # empty or outside the workspace
+    "main.py", "./main.py",                                     # the entry point
+    "main.py/x",                                                # below a file
+])
+def test_workspace_files_rejects_bad_names(name):
+    with pytest.raises(ValueError):
+        sandbox.workspace_files("python", "", {name: ""})
+
+
+def test_workspace_files_rejects_clashing_names():
+    with pytest.raises(ValueError):
+        sandbox.workspace_files("python", "", {"lib": "", "lib/util.py": ""})
+    with pytest.raises(ValueError):
+        sandbox.workspace_files("python", "", {"lib.txt": "", "./lib.txt": ""})
+
+
+def test_workspace_files_caps_count_and_size(monkeypatch):
+    monkeypatch.setattr(sandbox, "MAX_WORKSPACE_FILES", 2)
+    monkeypatch.setattr(sandbox, "MAX_WORKSPACE_BYTES", 10)
+    with pytest.raises(ValueError, match="Too many"):
+        sandbox.workspace_files("python", "", {"a": "", "b": "", "c": ""})
+    with pytest.raises(ValueError, match="too large"):
+        sandbox.workspace_files("python", "123456", {"a": "123456"})
@@ -0,0 +1,101 @@
+from sqlalchemy import text
+
+from database import engine
+from models import Course, Exercise
+import search
+
+
+def add_course(session, slug, title, description):
+    course = Course(slug=slug, title=title, description=description)
+    session.add(course)
+    session.flush()
+    search.index_course(session, course)
+    return course
+
+
+def add_exercise(session, course, slug, title, description):
+    exercise = Exercise(slug=slug, title=title, description=description,
+                        initial_code="", test_code="", course_id=course.id)
+    session.add(exercise)
+    session.flush()
+    search.index_exercise(session, exercise)
+    return exercise
+
+
+def test_build_match_query_quotes_terms_and_prefixes_last():
+    assert search.build_match_query("rust borrow") == '"rust" "borrow"*'
+
+
+def test_build_match_query_strips_fts_syntax():
+    assert search.build_match_query('"AND ( * NEAR') == '"AND" "NEAR"*'
+    assert search.build_match_query("  ()*  ") == ""
+
+
+def test_title_matches_rank_above_description_matches(session):
+    course = add_course(session, "rust", "Rust", "Systems programming")
+    add_exercise(session, course, "a", "Loops", "Iterate over a vector of lifetimes")
+    add_exercise(session, course, "b", "Lifetimes", "Annotate references")
+    session.commit()
+
+    results = search.search(session, "lifetimes")["results"]
+    assert [r["title"] for r in results] == ["Lifetimes", "Loops"]
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_pagination_and_kind_filter(session):
+    course = add_course(session, "py", "Python closures", "Functions")
+    for i in range(5):
+        add_exercise(session, course, f"e{i}", f"Closure {i}", "closures")
+    session.commit()
+
+    page = search.search(session, "closure", kind="exercise", limit=2, offset=4)
+    assert page["total"] == 5
+    assert len(page["results"]) == 1
+    assert search.search(session, "closure", kind="course")["total"] == 1
+
+
+def test_update_and_delete_keep_index_in_sync(session):
+    course = add_course(session, "c", "Course", "d")
+    exercise = add_exercise(session, course, "e", "Borrowing", "d")
+    session.commit()
+
+    exercise.title = "Iterators"
+    search.index_exercise(session, exercise)
+    session.commit()
+    assert search.search(session, "borrowing")["total"] == 0
+    assert search.search(session, "iterators")["total"] == 1
+
+    search.remove_exercise(session, exercise.id)
+    session.commit()
+    assert search.search(session, "iterators")["total"] == 0
+
+
+def test_broad_queries_are_capped(session, monkeypatch):
+    monkeypatch.setattr(search, "MAX_MATCHES", 3)
+    course = add_course(session, "c", "Course", "d")
+    for i in range(5):
+        add_exercise(session, course, f"e{i}", f"Traits {i}", "traits")
+    session.commit()
+
+    page = search.search(session, "traits", limit=2)
+    assert (page["total"], page["has_more"], len(page["results"])) == (3, True, 2)
+    page = search.search(session, "traits", limit=2, offset=2)
+    assert (page["has_more"], len(page["results"])) == (False, 1)
+
+
+def test_snippet_marks_prefix_matches_around_first_hit():
+    text = " ".join(f"w{i}" for i in range(30)) + " Borrowing rules, borrowed values."
+    assert search.snippet(text, ["borrow"], words=4) == "...w28 w29 <mark>Borrowing</mark> rules..."
+    assert search.snippet("Café crème", ["cafe"]) == "<mark>Café</mark> crème"
+
+
+def test_index_with_outdated_definition_is_rebuilt(session):
+    add_course(session, "rust", "Rust", "Systems programming")
+    session.exec(text("DROP TABLE search_index"))
+    session.exec(text("CREATE VIRTUAL TABLE search_index USING fts5(kind, ref_id, course_id, title, description)"))
+    session.commit()
+
+    search.create_search_index(engine)
+    definition = session.exec(text("SELECT sql FROM sqlite_master WHERE name = 'search_index'")).one()[0]
+    assert "prefix" in definition
+    assert search.search(session, "rust")["total"] == 1